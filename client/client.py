@@ -1,4 +1,5 @@
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import random
 import uuid
@@ -6,44 +7,78 @@ import uuid
 LB_URL = "http://localhost:8000"
 # LB_URL = "http://load-balancer:8000"
 
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=128, max_retries=0))
+
 def backoff(attempt, base=0.2, cap=2.0):
-    sleep = min(cap, base * 2 ** attempt) * (random.random() + 0.5)
-    time.sleep(sleep)
+    # Full jitter: sleeping anywhere in [0, capped exponential] keeps
+    # concurrent clients from reconverging on the same retry instant.
+    time.sleep(random.uniform(0, min(cap, base * (1 << attempt))))
+
+# Fail fast instead of retrying once the gateway has rejected this many
+# requests in a row - retry storms only prolong an overload.
+RETRY_DISABLE_THRESHOLD = 8
+_consecutive_failures = 0
+
+def _record_result(ok):
+    global _consecutive_failures
+    _consecutive_failures = 0 if ok else _consecutive_failures + 1
+
+def _retries_enabled():
+    return _consecutive_failures < RETRY_DISABLE_THRESHOLD
 
 def set_value(key, value, client_id):
     request_id = f"{client_id}-{int(time.time()*1000)}"
     for attempt in range(5):
         try:
-            r = requests.post(f"{LB_URL}/set", json={"key": key, "value": value, "request_id": request_id},
-                              headers={"X-Client-ID": client_id})
+            r = SESSION.post(f"{LB_URL}/set", json={"key": key, "value": value, "request_id": request_id},
+                             headers={"X-Client-ID": client_id})
             if r.status_code == 200:
+                _record_result(True)
                 print("SET OK:", r.json())
                 return
             elif r.status_code == 503:
+                _record_result(False)
+                if not _retries_enabled():
+                    print(f"Overloaded SET ({client_id}), giving up (retries disabled).")
+                    return
                 print(f"Overloaded SET ({client_id}), retrying...")
                 backoff(attempt)
             else:
                 print("SET error:", r.text)
                 break
         except Exception as e:
+            _record_result(False)
+            if not _retries_enabled():
+                print("SET exception, giving up (retries disabled):", e)
+                return
             print("SET exception:", e)
             backoff(attempt)
 
 def get_value(key, client_id):
     for attempt in range(5):
         try:
-            r = requests.get(f"{LB_URL}/get", params={"key": key},
-                             headers={"X-Client-ID": client_id})
+            r = SESSION.get(f"{LB_URL}/get", params={"key": key},
+                            headers={"X-Client-ID": client_id})
             if r.status_code == 200:
+                _record_result(True)
                 print("GET OK:", r.json())
                 return
             elif r.status_code == 503:
+                _record_result(False)
+                if not _retries_enabled():
+                    print(f" - Overloaded GET ({client_id}), giving up (retries disabled).")
+                    return
                 print(f" - Overloaded GET ({client_id}), retrying...")
                 backoff(attempt)
             else:
                 print("GET error:", r.text)
                 break
         except Exception as e:
+            _record_result(False)
+            if not _retries_enabled():
+                print("GET exception, giving up (retries disabled):", e)
+                return
             print("GET exception:", e)
             backoff(attempt)
 
@@ -1,24 +1,58 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import orjson
 import os
 import threading
 import time
 import requests
+from requests.adapters import HTTPAdapter
 import random
 import hashlib
+import heapq
 import bisect
 import logging
+import collections
+from array import array
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from functools import partial
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson; serves jsonify and request.json."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=32, pool_maxsize=128, max_retries=0))
+
+# Shared pool for fanning out replica RPCs in parallel.
+POOL = ThreadPoolExecutor(max_workers=64)
+
+# Advisory per-node count of outstanding RPCs; updated without a lock
+# (races only cost us a slightly stale load estimate).
+node_inflight = collections.defaultdict(int)
+
+# Micro-cache for hot keys: repeat reads within a second are served
+# locally instead of re-running the quorum. Writes through this gateway
+# invalidate; writes through other gateways are bounded by the TTL.
+READ_CACHE = TTLCache(maxsize=10_000, ttl=1.0)
+READ_CACHE_LOCK = threading.Lock()
 
 SEED_NODE = os.environ.get("SEED_NODE", "http://node:5000")
 REPLICATION_FACTOR = int(os.environ.get("REPLICATION_FACTOR", 3))
 NUM_VNODES = int(os.environ.get("NUM_VNODES", 16))
 RING_UPDATE_INTERVAL = int(os.environ.get("RING_UPDATE_INTERVAL", 2))
 RING_STABLE_PERIOD = int(os.environ.get("RING_STABLE_PERIOD", 5))
+READ_HEDGE_DELAY = float(os.environ.get("READ_HEDGE_DELAY", 0.01))
 
 IN_FLIGHT_LIMIT = int(os.environ.get("GATEWAY_IN_FLIGHT_LIMIT", 100))
-in_flight = 0
-in_flight_lock = threading.Lock()
+shed_gate = threading.BoundedSemaphore(IN_FLIGHT_LIMIT)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,41 +64,47 @@ node_states = {}
 last_ring_update = 0
 lock = threading.Lock()
 
+# Cached (ring, node_refs); rebuilt by poll_nodes only when the ready set
+# changes. Readers swap in the whole tuple atomically, so no lock is needed.
+_ring_cache = (array("Q"), [])
+_last_ready = ()
+
+# Vnode hashes per node never change, so compute them once per node address
+# and reuse the sorted list across ring rebuilds.
+_vnode_cache = {}
+
 def get_hash(val):
-    return int(hashlib.sha1(val.encode()).hexdigest(), 16)
+    # 64-bit BLAKE2b: native-int hashes for C-speed bisect, and the
+    # digest is cheaper to compute than SHA-1. Must match the nodes'
+    # get_hash so both sides agree on key placement.
+    return int.from_bytes(hashlib.blake2b(val.encode(), digest_size=8).digest(), "big")
 
-def build_hash_ring():
-    with lock:
-        ready_nodes = sorted([n for n in known_nodes if node_states.get(n) == "ready"])
+def _vnode_hashes(node):
+    vnodes = _vnode_cache.get(node)
+    if vnodes is None:
+        vnodes = sorted((get_hash(f"{node}-vn{v}"), node) for v in range(NUM_VNODES))
+        _vnode_cache[node] = vnodes
+    return vnodes
+
+def build_hash_ring(ready_nodes):
     if not ready_nodes:
-        return [], []
-    ring = []
+        return array("Q"), []
+    for stale in set(_vnode_cache) - set(ready_nodes):
+        del _vnode_cache[stale]
+    ring = array("Q")
     node_refs = []
-    for n in ready_nodes:
-        for v in range(NUM_VNODES):
-            label = f"{n}-vn{v}"
-            h = get_hash(label)
-            ring.append(h)
-            node_refs.append(n)
-    zipped = sorted(zip(ring, node_refs))
-    if zipped:
-        ring, node_refs = zip(*zipped)
-        return list(ring), list(node_refs)
-    return [], []
+    for h, n in heapq.merge(*(_vnode_hashes(n) for n in ready_nodes)):
+        ring.append(h)
+        node_refs.append(n)
+    return ring, node_refs
 
 def get_owner_nodes(key, rf=REPLICATION_FACTOR):
-    ring, node_refs = build_hash_ring()
+    ring, node_refs = _ring_cache
     if not ring:
         logger.info(f"[owner_nodes] No ring built! Returning [].")
         return []
     key_hash = get_hash(key)
     idx = bisect.bisect(ring, key_hash)
-
-    # Log the ring's contents
-    ring_info = [
-        f"{i}: hash={h}, node={node_refs[i]}"
-        for i, h in enumerate(ring)
-    ]
     owners = []
     seen = set()
     for i in range(len(ring)):
@@ -79,13 +119,26 @@ def get_owner_nodes(key, rf=REPLICATION_FACTOR):
     # logger.info(f"[owner_nodes] Final owners for key '{key}': {owners}")
     return owners
 
+_nodes_etag = None
+
+# Current ready set, published atomically by poll_nodes so request
+# handlers read it as a plain tuple instead of filtering under the lock.
+_ready_nodes = ()
+
 def poll_nodes():
-    global last_ring_update
+    global last_ring_update, _ring_cache, _last_ready, _nodes_etag, _ready_nodes
     while True:
         try:
-            resp = requests.get(f"{SEED_NODE}/nodes", timeout=2)
-            if resp.status_code == 200:
-                data = resp.json()
+            headers = {"If-None-Match": _nodes_etag} if _nodes_etag else {}
+            resp = SESSION.get(f"{SEED_NODE}/nodes", timeout=2, headers=headers)
+            if resp.status_code == 304:
+                # Membership unchanged since the last poll; just refresh
+                # the stability clock.
+                with lock:
+                    last_ring_update = time.time()
+            elif resp.status_code == 200:
+                _nodes_etag = resp.headers.get("ETag")
+                data = orjson.loads(resp.content)
                 nodes = set(data.get("nodes", []))
                 states = data.get("states", {})
                 with lock:
@@ -94,42 +147,94 @@ def poll_nodes():
                     node_states.clear()
                     node_states.update(states)
                     last_ring_update = time.time()
+                ready = tuple(sorted(n for n in nodes if states.get(n) == "ready"))
+                _ready_nodes = ready
+                if ready != _last_ready:
+                    _ring_cache = build_hash_ring(list(ready))
+                    _last_ready = ready
         except Exception:
             pass
         time.sleep(RING_UPDATE_INTERVAL)
 
 def is_ring_stable():
-    with lock:
-        ready_nodes = [n for n in known_nodes if node_states.get(n) == "ready"]
-    return (time.time() - last_ring_update) < RING_STABLE_PERIOD and len(ready_nodes) > 0
+    return (time.time() - last_ring_update) < RING_STABLE_PERIOD and len(_ready_nodes) > 0
+
+class RetryGuard:
+    """Turns retries off when the recent failure rate stays high.
+
+    Retrying into a saturated cluster multiplies its load; once the
+    failure rate has exceeded the threshold for `intervals` consecutive
+    windows, requests get a single attempt until a healthy window is
+    observed again.
+    """
+    def __init__(self, window=1.0, threshold=0.5, intervals=3, min_samples=10):
+        self.window = window
+        self.threshold = threshold
+        self.intervals = intervals
+        self.min_samples = min_samples
+        self.retries_enabled = True
+        self._lock = threading.Lock()
+        self._window_start = time.time()
+        self._successes = 0
+        self._failures = 0
+        self._bad_intervals = 0
 
-def retry_with_backoff(fn, max_retries=3, base_delay=0.05, jitter=0.05):
+    def record(self, ok):
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.window:
+                total = self._successes + self._failures
+                if total >= self.min_samples and self._failures / total > self.threshold:
+                    self._bad_intervals += 1
+                else:
+                    self._bad_intervals = 0
+                enabled = self._bad_intervals < self.intervals
+                if enabled != self.retries_enabled:
+                    logger.warning(f"RetryGuard: retries {'enabled' if enabled else 'disabled'}")
+                self.retries_enabled = enabled
+                self._window_start = now
+                self._successes = 0
+                self._failures = 0
+            if ok:
+                self._successes += 1
+            else:
+                self._failures += 1
+
+retry_guard = RetryGuard()
+
+def retry_with_backoff(fn, max_retries=3, base_delay=0.05, max_delay=2.0, max_elapsed=5.0):
+    start = time.time()
+    if not retry_guard.retries_enabled:
+        max_retries = 0
     for attempt in range(max_retries + 1):
         try:
             resp = fn()
             if resp is not None and resp.status_code == 200:
+                retry_guard.record(True)
                 return resp
+            retry_guard.record(False)
             if resp is not None and resp.status_code == 503:
                 # Overloaded, try again
                 pass
         except Exception:
-            pass
-        delay = base_delay * (2 ** attempt) + random.uniform(0, jitter)
-        time.sleep(delay)
+            retry_guard.record(False)
+        if attempt >= max_retries or time.time() - start >= max_elapsed:
+            break
+        # Full jitter: uniform over [0, capped exponential] avoids
+        # synchronized retry waves after an outage.
+        time.sleep(random.uniform(0, min(max_delay, base_delay * (1 << attempt))))
     return None
 
 def with_gateway_load_shedding(fn):
     def wrapper(*args, **kwargs):
-        global in_flight
-        with in_flight_lock:
-            if in_flight >= IN_FLIGHT_LIMIT:
-                return jsonify({"error": "gateway overloaded"}), 503
-            in_flight += 1
+        if not shed_gate.acquire(blocking=False):
+            # The kind also travels as a header so clients can classify
+            # overload responses without parsing the body.
+            return jsonify({"error": "gateway overloaded"}), 503, {"X-Error-Kind": "gateway_overloaded"}
         try:
             return fn(*args, **kwargs)
         finally:
-            with in_flight_lock:
-                in_flight -= 1
+            shed_gate.release()
     wrapper.__name__ = fn.__name__
     return wrapper
 
@@ -137,7 +242,7 @@ def with_gateway_load_shedding(fn):
 @with_gateway_load_shedding
 def gateway_set():
     if not is_ring_stable():
-        return jsonify({"error": "Cluster is not stable, try again soon."}), 503
+        return jsonify({"error": "Cluster is not stable, try again soon."}), 503, {"X-Error-Kind": "cluster_unstable"}
     data = request.json
     key = data["key"]
     value = data["value"]
@@ -145,23 +250,40 @@ def gateway_set():
     ts = float(data.get("ts", time.time()))
     owners = get_owner_nodes(key)
     if not owners:
-        return jsonify({"error": "No ready nodes found"}), 503
+        return jsonify({"error": "No ready nodes found"}), 503, {"X-Error-Kind": "no_ready_nodes"}
     W = max(len(owners) // 2 + 1, 1)
     successes = 0
     errors = []
-    for node_addr in owners:
-        def do_post():
-            return requests.post(
-                f"{node_addr}/internal/set", json={
-                    "key": key, "value": value, "ts": ts, "request_id": req_id
-                }, timeout=1
+
+    # Encode the replica payload once; requests would otherwise
+    # re-serialize the same dict for every owner (and every retry).
+    payload = orjson.dumps({"key": key, "value": value, "ts": ts, "request_id": req_id})
+
+    def do_post(node_addr):
+        node_inflight[node_addr] += 1
+        try:
+            return SESSION.post(
+                f"{node_addr}/internal/set", data=payload,
+                headers={"Content-Type": "application/json"}, timeout=1
             )
-        resp = retry_with_backoff(do_post)
+        finally:
+            node_inflight[node_addr] -= 1
+
+    owners.sort(key=lambda n: node_inflight[n])
+    futures = {POOL.submit(retry_with_backoff, partial(do_post, n)): n for n in owners}
+    for f in as_completed(futures):
+        resp = f.result()
         if resp and resp.status_code == 200:
             successes += 1
         else:
-            errors.append(f"{node_addr}: write failed or overload")
+            errors.append(f"{futures[f]}: write failed or overload")
+        if successes >= W:
+            for rem in futures:
+                rem.cancel()
+            break
     if successes >= W:
+        with READ_CACHE_LOCK:
+            READ_CACHE.pop(key, None)
         # logger.info(f"Write quorum reached for key={key} with W={W} out of {len(owners)} nodes.")
         return jsonify({"result": "ok", "successes": successes})
     else:
@@ -169,34 +291,58 @@ def gateway_set():
         return (
             jsonify({"result": "write_failed", "successes": successes, "errors": errors}),
             503,
+            {"X-Error-Kind": "write_failed"},
         )
 
 @app.route("/get", methods=["GET"])
 @with_gateway_load_shedding
 def gateway_get():
-    if not is_ring_stable():
-        return jsonify({"error": "Cluster is not stable, try again soon."}), 503
     key = request.args["key"]
+    with READ_CACHE_LOCK:
+        cached = READ_CACHE.get(key)
+    if cached is not None:
+        return jsonify({"key": key, "value": cached["value"], "ts": cached["ts"]})
+    if not is_ring_stable():
+        return jsonify({"error": "Cluster is not stable, try again soon."}), 503, {"X-Error-Kind": "cluster_unstable"}
     owners = get_owner_nodes(key)
     if not owners:
-        return jsonify({"error": "No ready nodes found"}), 503
+        return jsonify({"error": "No ready nodes found"}), 503, {"X-Error-Kind": "no_ready_nodes"}
     R = max(len(owners) // 2 + 1, 1)
     results = []
-    for node_addr in owners:
-        def do_get():
-            return requests.get(
+
+    def do_get(node_addr):
+        node_inflight[node_addr] += 1
+        try:
+            return SESSION.get(
                 f"{node_addr}/internal/get", params={"key": key}, timeout=1
             )
-        resp = retry_with_backoff(do_get)
+        finally:
+            node_inflight[node_addr] -= 1
+
+    # Only R replicas are needed for a quorum read: ask the R least
+    # loaded owners first and hedge with one spare if they are slow,
+    # instead of fanning out to all N.
+    owners.sort(key=lambda n: node_inflight[n])
+    futures = [POOL.submit(retry_with_backoff, partial(do_get, n)) for n in owners[:R]]
+    spares = owners[R:]
+    done, _ = wait(futures, timeout=READ_HEDGE_DELAY)
+    if len(done) < R and spares:
+        futures.append(POOL.submit(retry_with_backoff, partial(do_get, spares[0])))
+    for f in as_completed(futures):
+        resp = f.result()
         if resp and resp.status_code == 200:
-            v = resp.json().get("value")
+            v = orjson.loads(resp.content).get("value")
             if v:
                 results.append(v)
         if len(results) >= R:
+            for rem in futures:
+                rem.cancel()
             break
     if not results:
         return jsonify({"result": "not_found"}), 404
     latest = max(results, key=lambda x: x["ts"])
+    with READ_CACHE_LOCK:
+        READ_CACHE[key] = {"value": latest["value"], "ts": latest["ts"]}
     if len(results) >= R:
         logger.info(f"Read quorum reached for key={key} with R={R} out of {len(owners)} nodes.")
     else:
@@ -205,25 +351,24 @@ def gateway_get():
 
 @app.route("/status", methods=["GET"])
 def gateway_status():
-    with lock:
-        ready_nodes = [n for n in known_nodes if node_states.get(n) == "ready"]
+    ready_nodes = list(_ready_nodes)
     return jsonify({
         "ready_nodes": ready_nodes,
         "known_nodes": list(known_nodes),
         "node_states": node_states,
         "ring_stable": is_ring_stable(),
         "num_ready": len(ready_nodes),
-        "gateway_inflight": in_flight,
+        "gateway_inflight": IN_FLIGHT_LIMIT - shed_gate._value,
         "gateway_inflight_limit": IN_FLIGHT_LIMIT
     })
 
 @app.route("/ring", methods=["GET"])
 def display_ring():
-    ring, node_refs = build_hash_ring()
+    ring, node_refs = _ring_cache
     if not ring:
         return jsonify({"error": "No ready nodes in the ring"}), 503
     return jsonify({
-        "ring": ring,
+        "ring": list(ring),
         "node_refs": node_refs,
         "num_vnodes": NUM_VNODES,
         "replication_factor": REPLICATION_FACTOR
@@ -231,6 +376,5 @@ def display_ring():
 
 if __name__ == "__main__":
     threading.Thread(target=poll_nodes, daemon=True).start()
-    logFlask = logging.getLogger('werkzeug')
-    logFlask.setLevel(logging.ERROR)
-    app.run(host="0.0.0.0", port=8000)
+    from waitress import serve
+    serve(app, host="0.0.0.0", port=8000, threads=32)
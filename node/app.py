@@ -1,16 +1,33 @@
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
+import orjson
 import os
 import threading
 import time
 import sqlite3
 import requests
+from requests.adapters import HTTPAdapter
 import random
 import signal
 import logging
 import hashlib
 import bisect
+import math
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson; serves jsonify and request.json."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=64, pool_maxsize=64, max_retries=0))
 
 DB_FILE = os.environ.get("DB_FILE", "/data/kv.db")
 NODE_HOST = os.environ.get("NODE_HOST", "localhost")
@@ -21,16 +38,22 @@ REPLICATION_FACTOR = int(os.environ.get("REPLICATION_FACTOR", 3))
 NUM_VNODES = int(os.environ.get("NUM_VNODES", 16))
 
 known_nodes = set([NODE_ADDR])
+# Single lock for all membership state: known_nodes, node_states,
+# dead_nodes and membership_version always change together.
 known_nodes_lock = threading.Lock()
 node_states = {}
 node_last_seen = {NODE_ADDR: time.time()}
 dead_nodes = set()
-dead_nodes_lock = threading.Lock()
+
+# Bumped (under known_nodes_lock) whenever membership or a node state
+# changes; lets pollers skip re-reading an unchanged view.
+membership_version = 0
+
+def membership_etag():
+    return f"{NODE_ADDR}-{membership_version}"
 
 MAX_IN_FLIGHT = int(os.environ.get("MAX_IN_FLIGHT", 8))
-in_flight = 0
-in_flight_lock = threading.Lock()
-db_write_lock = threading.Lock()
+shed_gate = threading.BoundedSemaphore(MAX_IN_FLIGHT)
 
 DEAD_TIMEOUT = 30
 
@@ -40,62 +63,135 @@ logging.basicConfig(
 )
 logger = logging.getLogger("node")
 
+_tls = threading.local()
+
+def _init_db():
+    conn = sqlite3.connect(DB_FILE)
+    conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, ts REAL, request_id TEXT)")
+    conn.commit()
+    conn.close()
+
+def get_conn():
+    conn = getattr(_tls, "conn", None)
+    if conn is None:
+        # isolation_level=None -> autocommit; write paths open explicit
+        # BEGIN IMMEDIATE transactions instead of sqlite3's implicit ones.
+        conn = sqlite3.connect(DB_FILE, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA mmap_size=268435456")
+        conn.execute("PRAGMA busy_timeout=5000")
+        _tls.conn = conn
+    return conn
+
+_init_db()
+
 def set_state(state):
+    global membership_version
     with known_nodes_lock:
-        node_states[NODE_ADDR] = state
+        if node_states.get(NODE_ADDR) != state:
+            node_states[NODE_ADDR] = state
+            membership_version += 1
 
 def get_all_local_keys():
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, ts REAL, request_id TEXT)")
-    cur = conn.execute("SELECT key FROM kv")
-    keys = [row[0] for row in cur.fetchall()]
-    conn.close()
-    return keys
+    # Streams the index-only scan of the PRIMARY KEY straight into a
+    # set; callers all want membership semantics anyway.
+    return {row[0] for row in get_conn().execute("SELECT key FROM kv")}
 
 def internal_set_local(key, value, ts, req_id):
-    with db_write_lock:
-        conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-        conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT, ts REAL, request_id TEXT)")
-        cur = conn.execute("SELECT ts, request_id FROM kv WHERE key = ?", (key,))
-        row = cur.fetchone()
-        if row:
-            prev_ts, prev_req = row
-            if prev_req == req_id:
-                conn.close()
-                return True
-            if ts < prev_ts:
-                conn.close()
-                return False
-        conn.execute(
-            "REPLACE INTO kv (key, value, ts, request_id) VALUES (?, ?, ?, ?)",
-            (key, value, ts, req_id),
+    # Single conditional UPSERT: the engine does the staleness check and
+    # the write atomically, so no Python-level lock or explicit
+    # transaction is needed. IS NOT handles NULL request_ids.
+    conn = get_conn()
+    before = conn.total_changes
+    conn.execute(
+        "INSERT INTO kv (key, value, ts, request_id) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT(key) DO UPDATE SET value = excluded.value, ts = excluded.ts, "
+        "request_id = excluded.request_id "
+        "WHERE excluded.ts >= kv.ts AND kv.request_id IS NOT excluded.request_id",
+        (key, value, ts, req_id),
+    )
+    return conn.total_changes > before
+
+def internal_set_many_local(values):
+    # Bulk ingest for the sync paths: one executemany inside one
+    # transaction instead of a per-key autocommit write. Same
+    # conditional UPSERT as internal_set_local, so stale entries in the
+    # batch are ignored row by row.
+    rows = [(k, v["value"], v["ts"], v.get("request_id")) for k, v in values.items()]
+    if not rows:
+        return
+    conn = get_conn()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany(
+            "INSERT INTO kv (key, value, ts, request_id) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, ts = excluded.ts, "
+            "request_id = excluded.request_id "
+            "WHERE excluded.ts >= kv.ts AND kv.request_id IS NOT excluded.request_id",
+            rows,
         )
-        conn.commit()
-        conn.close()
-        return True
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
 
 def internal_get_local(key):
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    cur = conn.execute("SELECT value, ts, request_id FROM kv WHERE key = ?", (key,))
+    cur = get_conn().execute("SELECT value, ts, request_id FROM kv WHERE key = ?", (key,))
     row = cur.fetchone()
-    conn.close()
     if row:
         value, ts, req_id = row
         return {"value": value, "ts": ts, "request_id": req_id}
     return None
 
+# Chunk size for batched key transfer; stays under SQLite's default limit
+# of 999 bound variables per statement.
+SYNC_BATCH_SIZE = 500
+
+def internal_get_many_local(keys):
+    conn = get_conn()
+    result = {}
+    for i in range(0, len(keys), SYNC_BATCH_SIZE):
+        chunk = keys[i:i + SYNC_BATCH_SIZE]
+        placeholders = ",".join("?" * len(chunk))
+        cur = conn.execute(
+            f"SELECT key, value, ts, request_id FROM kv WHERE key IN ({placeholders})",
+            chunk,
+        )
+        for key, value, ts, req_id in cur.fetchall():
+            result[key] = {"value": value, "ts": ts, "request_id": req_id}
+    return result
+
+# Anti-entropy digest granularity: keys are bucketed by the low byte of
+# their ring hash, so peers exchange 256 bucket digests instead of full
+# key lists and only drill into buckets that differ.
+DIGEST_BUCKETS = 256
+
+def compute_digest():
+    cur = get_conn().execute("SELECT key, ts FROM kv ORDER BY key")
+    hashers = {}
+    for key, ts in cur:
+        b = get_hash(key) % DIGEST_BUCKETS
+        h = hashers.get(b)
+        if h is None:
+            h = hashlib.blake2b(digest_size=8)
+            hashers[b] = h
+        h.update(f"{key}:{ts!r};".encode())
+    return {str(b): h.hexdigest() for b, h in hashers.items()}
+
+def bucket_keys_local(bucket):
+    cur = get_conn().execute("SELECT key, ts FROM kv")
+    return {key: ts for key, ts in cur if get_hash(key) % DIGEST_BUCKETS == bucket}
+
 def with_node_load_shedding(fn):
     def wrapper(*args, **kwargs):
-        global in_flight
-        with in_flight_lock:
-            if in_flight >= MAX_IN_FLIGHT:
-                return jsonify({"error": "node overloaded"}), 503
-            in_flight += 1
+        if not shed_gate.acquire(blocking=False):
+            return jsonify({"error": "node overloaded"}), 503, {"X-Error-Kind": "node_overloaded"}
         try:
             return fn(*args, **kwargs)
         finally:
-            with in_flight_lock:
-                in_flight -= 1
+            shed_gate.release()
     wrapper.__name__ = fn.__name__
     return wrapper
 
@@ -119,80 +215,117 @@ def internal_get():
     # logger.info("Read key %s with value %s on node %s", key, value, NODE_ADDR)
     return jsonify({"key": key, "value": value})
 
+@app.route("/internal/set_many", methods=["POST"])
+@with_node_load_shedding
+def internal_set_many():
+    values = request.json
+    internal_set_many_local(values)
+    return jsonify({"result": "ok", "count": len(values)})
+
 @app.route("/internal/get_many", methods=["POST"])
 @with_node_load_shedding
 def internal_get_many():
     keys = request.json.get("keys", [])
-    result = {}
-    for key in keys:
-        val = internal_get_local(key)
-        if val:
-            result[key] = val
-    return jsonify(result)
+    return jsonify(internal_get_many_local(keys))
 
 @app.route("/internal/all_keys", methods=["GET"])
 def internal_all_keys():
-    keys = get_all_local_keys()
-    return jsonify({"keys": keys})
+    return jsonify({"keys": list(get_all_local_keys())})
+
+@app.route("/internal/digest", methods=["GET"])
+def internal_digest():
+    return jsonify({"buckets": compute_digest()})
+
+@app.route("/internal/bucket_keys", methods=["GET"])
+def internal_bucket_keys():
+    bucket = int(request.args["bucket"])
+    return jsonify(bucket_keys_local(bucket))
 
 @app.route("/nodes", methods=["GET"])
 def get_nodes():
-    with known_nodes_lock, dead_nodes_lock:
-        return jsonify({
-            "nodes": list(known_nodes),
-            "states": node_states,
-            "dead_nodes": list(dead_nodes)
-        })
+    with known_nodes_lock:
+        etag = membership_etag()
+        if request.headers.get("If-None-Match") == etag:
+            return "", 304, {"ETag": etag}
+        nodes, states, dead = list(known_nodes), dict(node_states), list(dead_nodes)
+    return jsonify({
+        "nodes": nodes,
+        "states": states,
+        "dead_nodes": dead
+    }), 200, {"ETag": etag}
 
 @app.route("/gossip", methods=["POST"])
 def gossip():
+    global membership_version
     data = request.get_json()
-    their_nodes = set(data.get("nodes", []))
-    their_states = data.get("states", {})
-    their_dead = set(data.get("dead_nodes", []))
+    # Version the sender believes we are at; if it matches, the full
+    # state is omitted from the response.
+    their_view_of_us = data.get("peer_version")
     membership_changed = False
-    with known_nodes_lock, dead_nodes_lock:
-        added_dead = their_dead - dead_nodes
-        if added_dead:
-            logger.info(f"Gossip: learned about {len(added_dead)} dead nodes.")
-        dead_nodes.update(their_dead)
-        for dn in dead_nodes:
-            if dn in known_nodes:
-                known_nodes.discard(dn)
-                node_states.pop(dn, None)
-        before_nodes = set(known_nodes)
-        added = {n for n in their_nodes if n not in dead_nodes} - known_nodes
-        known_nodes.update(added)
-        for node, state in their_states.items():
-            if node not in dead_nodes and node_states.get(node) != state:
-                node_states[node] = state
+    added = set()
+    with known_nodes_lock:
+        if "nodes" in data:
+            their_nodes = set(data.get("nodes", []))
+            their_states = data.get("states", {})
+            their_dead = set(data.get("dead_nodes", []))
+            added_dead = their_dead - dead_nodes
+            if added_dead:
+                logger.info(f"Gossip: learned about {len(added_dead)} dead nodes.")
+            dead_nodes.update(their_dead)
+            for dn in dead_nodes:
+                if dn in known_nodes:
+                    known_nodes.discard(dn)
+                    node_states.pop(dn, None)
+                    membership_changed = True
+            added = {n for n in their_nodes if n not in dead_nodes} - known_nodes
+            known_nodes.update(added)
+            if added or added_dead:
                 membership_changed = True
-        after_nodes = set(known_nodes)
-        if before_nodes != after_nodes or added_dead:
-            membership_changed = True
-        if membership_changed:
-            logger.info(f"Gossip (incoming): membership changed.")
-        if added:
-            logger.info(f"Gossip (incoming): Added {len(added)} new node(s).")
-        cluster_view = ", ".join(sorted(known_nodes))
-        return jsonify({
-            "status": "ok",
-            "added": len(added),
-            "nodes": list(known_nodes),
-            "states": node_states,
-            "dead_nodes": list(dead_nodes)
-        })
+            for node, state in their_states.items():
+                if node not in dead_nodes and node_states.get(node) != state:
+                    node_states[node] = state
+                    membership_changed = True
+            if membership_changed:
+                membership_version += 1
+                logger.info(f"Gossip (incoming): membership changed.")
+            if added:
+                logger.info(f"Gossip (incoming): Added {len(added)} new node(s).")
+        version = membership_version
+        snapshot = None
+        if their_view_of_us != version:
+            snapshot = (list(known_nodes), dict(node_states), list(dead_nodes))
+    # Serialize outside the lock; only the snapshot needs protection.
+    response = {
+        "status": "ok",
+        "added": len(added),
+        "version": version,
+    }
+    if snapshot is not None:
+        response["nodes"], response["states"], response["dead_nodes"] = snapshot
+    return jsonify(response)
 
 def get_live_ready_nodes():
-    with known_nodes_lock, dead_nodes_lock:
+    with known_nodes_lock:
         return sorted([n for n in known_nodes if node_states.get(n) == "ready" and n not in dead_nodes])
 
 def get_hash(val):
-    return int(hashlib.sha1(val.encode()).hexdigest(), 16)
+    # 64-bit BLAKE2b; must match the gateway's get_hash so both sides
+    # agree on key placement.
+    return int.from_bytes(hashlib.blake2b(val.encode(), digest_size=8).digest(), "big")
+
+# Cached (membership_version, ring, node_refs); the ring only changes
+# when membership does, so per-key owner lookups reuse it.
+_ring_cache = (-1, [], [])
 
 def get_hash_ring():
+    global _ring_cache
+    version = membership_version
+    cached = _ring_cache
+    if cached[0] == version:
+        return cached[1], cached[2]
     nodes = get_live_ready_nodes()
     if not nodes:
+        _ring_cache = (version, [], [])
         return [], []
     ring = []
     node_refs = []
@@ -203,10 +336,10 @@ def get_hash_ring():
             ring.append(h)
             node_refs.append(n)
     zipped = sorted(zip(ring, node_refs))
-    if zipped:
-        ring, node_refs = zip(*zipped)
-        return list(ring), list(node_refs)
-    return [], []
+    ring, node_refs = zip(*zipped)
+    ring, node_refs = list(ring), list(node_refs)
+    _ring_cache = (version, ring, node_refs)
+    return ring, node_refs
 
 def get_owner_nodes(key, rf=REPLICATION_FACTOR):
     ring, node_refs = get_hash_ring()
@@ -226,92 +359,163 @@ def get_owner_nodes(key, rf=REPLICATION_FACTOR):
                 break
     return owners
 
+# Per-slot ownership mask, cached like the ring: mask[i] is True when this
+# node is among the RF owners for keys landing at ring slot i. Sync paths
+# classify whole key batches with one bisect + one index per key instead
+# of rebuilding the owner list for each key.
+_owned_mask_cache = (-1, [])
+
+def _owned_slot_mask():
+    global _owned_mask_cache
+    version = membership_version
+    cached = _owned_mask_cache
+    if cached[0] == version:
+        return cached[1]
+    ring, node_refs = get_hash_ring()
+    n = len(ring)
+    mask = []
+    for idx in range(n):
+        owners = set()
+        for i in range(n):
+            owners.add(node_refs[(idx + i) % n])
+            if len(owners) == REPLICATION_FACTOR:
+                break
+        mask.append(NODE_ADDR in owners)
+    _owned_mask_cache = (version, mask)
+    return mask
+
+def filter_owned_keys(keys):
+    ring, _ = get_hash_ring()
+    if not ring:
+        return []
+    mask = _owned_slot_mask()
+    n = len(ring)
+    return [k for k in keys if mask[bisect.bisect(ring, get_hash(k)) % n]]
+
 def gossip_thread():
-    session = requests.Session()
+    global membership_version
+    # Per-peer bookkeeping, owned by this thread: which of our versions
+    # each peer has acked, and the last version we saw from each peer.
+    peer_acked = {}
+    peer_versions = {}
     while True:
         time.sleep(2)
-        with known_nodes_lock, dead_nodes_lock:
+        with known_nodes_lock:
             peers = list(known_nodes - {NODE_ADDR})
-            gossip_payload = {
+            payload_version = membership_version
+            full_state = {
                 "nodes": list(known_nodes),
-                "states": node_states,
+                "states": dict(node_states),
                 "dead_nodes": list(dead_nodes)
             }
         if not peers:
             continue
-        fanout = min(3, max(1, int(len(peers) ** 0.5)))
+        # Logarithmic fanout: rumors reach the whole cluster in O(log N)
+        # rounds without the bandwidth of gossiping to everyone.
+        fanout = max(1, min(len(peers), int(1.4 * math.log(max(len(peers), 2)) + 1)))
         selected_peers = random.sample(peers, fanout)
         for peer in selected_peers:
             try:
-                resp = session.post(f"{peer}/gossip", json=gossip_payload, timeout=1)
+                gossip_payload = {
+                    "version": payload_version,
+                    "peer_version": peer_versions.get(peer),
+                }
+                if peer_acked.get(peer) != payload_version:
+                    # Peer has not seen this version of our state yet.
+                    gossip_payload.update(full_state)
+                resp = SESSION.post(f"{peer}/gossip", json=gossip_payload, timeout=1)
                 if resp.status_code == 200:
-                    data = resp.json()
+                    data = orjson.loads(resp.content)
+                    peer_acked[peer] = payload_version
+                    peer_versions[peer] = data.get("version")
+                    if "nodes" not in data:
+                        continue
                     their_nodes = set(data.get("nodes", []))
                     their_states = data.get("states", {})
                     their_dead = set(data.get("dead_nodes", []))
                     membership_changed = False
-                    before_nodes = set(known_nodes)
+                    added_dead = their_dead - dead_nodes
                     dead_nodes.update(their_dead)
                     for dn in dead_nodes:
-                        known_nodes.discard(dn)
-                        node_states.pop(dn, None)
+                        if dn in known_nodes:
+                            known_nodes.discard(dn)
+                            node_states.pop(dn, None)
+                            membership_changed = True
                     added = {n for n in their_nodes if n not in dead_nodes} - known_nodes
                     known_nodes.update(added)
+                    if added or added_dead:
+                        membership_changed = True
                     for node, state in their_states.items():
                         if node not in dead_nodes and node_states.get(node) != state:
                             node_states[node] = state
                             membership_changed = True
-                    after_nodes = set(known_nodes)
-                    if before_nodes != after_nodes or their_dead:
-                        membership_changed = True
+                    if membership_changed:
+                        with known_nodes_lock:
+                            membership_version += 1
             except Exception as e:
                 logger.debug(f"Gossip with {peer} failed: {e}")
 
 def health_check_thread():
+    global membership_version
+    # Last ETag seen per peer; an unchanged peer answers with an empty
+    # 304, which counts as alive just like a 200.
+    status_etags = {}
     while True:
         time.sleep(5)
         dead_now = []
-        with known_nodes_lock, dead_nodes_lock:
+        with known_nodes_lock:
             peers = list(known_nodes - {NODE_ADDR})
         for peer in peers:
             try:
-                resp = requests.get(f"{peer}/status", timeout=2)
-                if resp.status_code == 200:
+                etag = status_etags.get(peer)
+                headers = {"If-None-Match": etag} if etag else {}
+                resp = SESSION.get(f"{peer}/status", timeout=2, headers=headers)
+                if resp.status_code in (200, 304):
+                    status_etags[peer] = resp.headers.get("ETag")
                     node_last_seen[peer] = time.time()
             except Exception:
                 if time.time() - node_last_seen.get(peer, 0) > DEAD_TIMEOUT:
                     logger.info(f"Health check: node {peer} considered dead.")
                     dead_now.append(peer)
         if dead_now:
-            with known_nodes_lock, dead_nodes_lock:
+            with known_nodes_lock:
                 for dn in dead_now:
                     known_nodes.discard(dn)
                     node_states.pop(dn, None)
                     dead_nodes.add(dn)
                     node_last_seen.pop(dn, None)
+                membership_version += 1
 
 @app.route("/status", methods=["GET"])
 def status():
-    with known_nodes_lock, dead_nodes_lock, in_flight_lock:
-        return jsonify({
-            "nodes": list(known_nodes),
-            "node_states": node_states,
-            "dead_nodes": list(dead_nodes),
-            "in_flight": in_flight,
-            "max_in_flight": MAX_IN_FLIGHT,
-        })
+    # The ETag tracks membership only; pollers that just probe liveness
+    # (health checks) get an empty 304 instead of a fresh snapshot. The
+    # in-flight gauge is debug info, not worth defeating the cache for.
+    with known_nodes_lock:
+        etag = membership_etag()
+        if request.headers.get("If-None-Match") == etag:
+            return "", 304, {"ETag": etag}
+        nodes, states, dead = list(known_nodes), dict(node_states), list(dead_nodes)
+    return jsonify({
+        "nodes": nodes,
+        "node_states": states,
+        "dead_nodes": dead,
+        "in_flight": MAX_IN_FLIGHT - shed_gate._value,
+        "max_in_flight": MAX_IN_FLIGHT,
+    }), 200, {"ETag": etag}
 
 def join_cluster(seed_addr):
+    global membership_version
     if not seed_addr or seed_addr == NODE_ADDR:
         return
     try:
-        resp = requests.get(f"{seed_addr}/nodes", timeout=2)
+        resp = SESSION.get(f"{seed_addr}/nodes", timeout=2)
         if resp.status_code == 200:
-            resp_json = resp.json()
+            resp_json = orjson.loads(resp.content)
             their_nodes = set(resp_json.get("nodes", []))
             their_states = resp_json.get("states", {})
             their_dead = set(resp_json.get("dead_nodes", []))
-            with known_nodes_lock, dead_nodes_lock:
+            with known_nodes_lock:
                 known_nodes.update(their_nodes)
                 node_states.update(their_states)
                 dead_nodes.update(their_dead)
@@ -319,70 +523,76 @@ def join_cluster(seed_addr):
                 for dn in dead_nodes:
                     known_nodes.discard(dn)
                     node_states.pop(dn, None)
+                membership_version += 1
     except Exception:
         pass
 
 def initial_sync_and_anti_entropy():
-    with known_nodes_lock, dead_nodes_lock:
+    with known_nodes_lock:
         peers = [n for n in known_nodes if n != NODE_ADDR and node_states.get(n) == "ready" and n not in dead_nodes]
+    def fetch_peer_keys(peer):
+        resp = SESSION.get(f"{peer}/internal/all_keys", timeout=10)
+        return set(orjson.loads(resp.content).get("keys", []))
+
     needed_keys = set()
-    for peer in peers:
-        try:
-            resp = requests.get(f"{peer}/internal/all_keys", timeout=10)
-            peer_keys = set(resp.json().get("keys", []))
-            for key in peer_keys:
-                if NODE_ADDR in get_owner_nodes(key):
-                    needed_keys.add(key)
-        except Exception as e:
-            print(f"Sync error from {peer}:", e)
-    local_keys = set(get_all_local_keys())
+    if peers:
+        # Pull every peer's key list in parallel; a cold join against
+        # many peers is bounded by the slowest peer, not the sum.
+        with ThreadPoolExecutor(max_workers=min(8, len(peers))) as ex:
+            futures = {ex.submit(fetch_peer_keys, p): p for p in peers}
+            for f in as_completed(futures):
+                try:
+                    peer_keys = f.result()
+                except Exception as e:
+                    print(f"Sync error from {futures[f]}:", e)
+                    continue
+                needed_keys.update(filter_owned_keys(peer_keys))
+    local_keys = get_all_local_keys()
     missing = list(needed_keys - local_keys)
     for peer in peers:
         if not missing:
             break
         try:
-            fetch = [k for k in missing if NODE_ADDR in get_owner_nodes(k)]
-            if fetch:
-                val_resp = requests.post(f"{peer}/internal/get_many", json={"keys": fetch}, timeout=10)
-                values = val_resp.json()
-                for key, v in values.items():
-                    internal_set_local(key, v["value"], v["ts"], v.get("request_id"))
-                missing = [k for k in missing if k not in values]
+            fetch = filter_owned_keys(missing)
+            received = set()
+            for i in range(0, len(fetch), SYNC_BATCH_SIZE):
+                chunk = fetch[i:i + SYNC_BATCH_SIZE]
+                val_resp = SESSION.post(f"{peer}/internal/get_many", json={"keys": chunk}, timeout=10)
+                values = orjson.loads(val_resp.content)
+                internal_set_many_local(values)
+                received.update(values)
+            missing = [k for k in missing if k not in received]
         except Exception as e:
             print(f"Fetch error from {peer}:", e)
     set_state("ready")
 
 def anti_entropy_thread():
-    session = requests.Session()
     while True:
         time.sleep(10)
-        with known_nodes_lock, dead_nodes_lock:
+        with known_nodes_lock:
             peers = [n for n in known_nodes if n != NODE_ADDR and node_states.get(n) == "ready" and n not in dead_nodes]
         if not peers:
             continue
-        local_keys = set(get_all_local_keys())
+        local_digest = compute_digest()
         for peer in peers:
             try:
-                resp = session.get(f"{peer}/internal/all_keys", timeout=5)
-                peer_keys = set(resp.json().get("keys", []))
-                for key in peer_keys:
-                    owners = get_owner_nodes(key)
-                    if NODE_ADDR in owners:
+                resp = SESSION.get(f"{peer}/internal/digest", timeout=5)
+                peer_digest = orjson.loads(resp.content).get("buckets", {})
+                mismatched = [b for b, d in peer_digest.items() if local_digest.get(b) != d]
+                stale = []
+                for b in mismatched:
+                    r = SESSION.get(f"{peer}/internal/bucket_keys", params={"bucket": b}, timeout=5)
+                    peer_ts = orjson.loads(r.content)
+                    for key in filter_owned_keys(peer_ts):
                         local_val = internal_get_local(key)
-                        need = False
-                        if not local_val:
-                            need = True
-                        else:
-                            val_resp = session.get(f"{peer}/internal/get", params={"key": key}, timeout=3)
-                            if val_resp.status_code == 200 and val_resp.json().get("value"):
-                                remote_val = val_resp.json()["value"]
-                                if remote_val["ts"] > local_val["ts"]:
-                                    need = True
-                        if need:
-                            val_resp = session.get(f"{peer}/internal/get", params={"key": key}, timeout=3)
-                            if val_resp.status_code == 200 and val_resp.json().get("value"):
-                                v = val_resp.json()["value"]
-                                internal_set_local(key, v["value"], v["ts"], v.get("request_id"))
+                        if not local_val or peer_ts[key] > local_val["ts"]:
+                            stale.append(key)
+                if stale:
+                    val_resp = SESSION.post(f"{peer}/internal/get_many", json={"keys": stale}, timeout=10)
+                    internal_set_many_local(orjson.loads(val_resp.content))
+                    # Local state moved; refresh the digest before
+                    # comparing against the next peer.
+                    local_digest = compute_digest()
             except Exception as e:
                 logger.debug(f"Anti-entropy sync with {peer} failed: {e}")
 
@@ -401,6 +611,7 @@ if __name__ == "__main__":
     print("Node started at", NODE_ADDR)
     for sig in (signal.SIGTERM, signal.SIGINT):
         signal.signal(sig, deregister)
-    logFlask = logging.getLogger('werkzeug')
-    logFlask.setLevel(logging.ERROR)
-    app.run(host="0.0.0.0", port=NODE_PORT)
+    # Threaded WSGI server; Flask's dev server serializes requests and
+    # falls over under the replication fan-in from the gateway.
+    from waitress import serve
+    serve(app, host="0.0.0.0", port=NODE_PORT, threads=32)
@@ -1,35 +1,38 @@
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 GATEWAY = "http://localhost:8000"
+SESSION = requests.Session()
 TEST_KEY = "consistency_key"
 VALUE1 = "before-scale"
 VALUE2 = "after-scale"
 WAIT = 1
 
 def set_value(value):
-    r = requests.post(f"{GATEWAY}/set", json={"key": TEST_KEY, "value": value})
+    r = SESSION.post(f"{GATEWAY}/set", json={"key": TEST_KEY, "value": value})
     return r.json()
 
 def get_value():
     try:
-        r = requests.get(f"{GATEWAY}/get", params={"key": TEST_KEY}, timeout=1)
+        r = SESSION.get(f"{GATEWAY}/get", params={"key": TEST_KEY}, timeout=1)
         return r.json().get("value")
     except Exception:
         return None
 
 def poll_reads(expected, n=5):
+    # Issue the reads in parallel over the pooled session; n sequential
+    # requests with a sleep between each made a poll take n/4 seconds.
     print(f"Polling {n} reads; expected value: '{expected}'")
     stale = 0
     correct = 0
-    for _ in range(n):
-        val = get_value()
-        print(f"  -> Read: {val}")
-        if val == expected:
-            correct += 1
-        else:
-            stale += 1
-        time.sleep(0.25)
+    with ThreadPoolExecutor(max_workers=n) as ex:
+        for val in ex.map(lambda _: get_value(), range(n)):
+            print(f"  -> Read: {val}")
+            if val == expected:
+                correct += 1
+            else:
+                stale += 1
     return correct, stale
 
 print(f"\n[1] Setting '{TEST_KEY}' to '{VALUE1}'...")